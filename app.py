@@ -2,26 +2,31 @@
 Text Summarizer using Hugging Face Transformers and Gradio.
 """
 
-import os
 import logging
 import gradio as gr
-from transformers import pipeline
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# summarizer_models sets the CPU thread counts, so it has to be imported before anything loads torch
+from summarizer_models import (
+    DEFAULT_NUM_BEAMS, GENERATION_KWARGS, SUMMARIZER_MODEL, ResultCache,
+    device_label, get_summarizer, stream_summary, summarizer_context, text_key
+)
 
 # --- Configuration & Setup ---
 # Configure logging to show timestamps and levels
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Disable Hugging Face symlink warnings for Windows users
-os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-
 # Constants
-MODEL_NAME = "sshleifer/distilbart-cnn-12-6"
+MODEL_NAME = SUMMARIZER_MODEL
 APP_TITLE = "Text Summarizer using DistilBART"
 APP_DESCRIPTION = """
 ### Summarize text using the distilbart-cnn-12-6 model.
 """
 
+# Max number of queued requests summarized together in one forward pass
+BATCH_SIZE = 8
+
 SAMPLE_TEXT = """
 Apollo 11 was the American spaceflight that first landed humans on the Moon. Commander Neil Armstrong and lunar module pilot Buzz Aldrin landed the Apollo Lunar Module Eagle on July 20, 1969. Armstrong became the first person to step onto the lunar surface six hours and 39 minutes later on July 21 at 02:56 UTC; Aldrin joined him 19 minutes later. They spent about two and a quarter hours together outside the spacecraft, and they collected 47.5 pounds (21.5 kg) of lunar material to bring back to Earth. Michael Collins flew the Command Module Columbia alone in lunar orbit while they were on the Moon's surface. Armstrong and Aldrin spent 21 hours, 36 minutes on the lunar surface before lifting off to rejoin Columbia.
 """
@@ -29,7 +34,7 @@ Apollo 11 was the American spaceflight that first landed humans on the Moon. Com
 # --- Model Initialization ---
 try:
     logger.info(f"Loading model: {MODEL_NAME}...")
-    summarizer = pipeline("summarization", model=MODEL_NAME)
+    summarizer = get_summarizer()
     logger.info("Model loaded successfully.")
 except Exception as e:
     logger.error(f"Failed to load model: {e}")
@@ -37,10 +42,12 @@ except Exception as e:
 
 
 # --- Core Logic ---
-def summarize_text(text: str, max_len: int, min_len: int) -> str:
-    """
-    Generates a summary for the provided text using the loaded model.
-    """
+# Finished summaries, keyed on (text hash, max_len, min_len, num_beams)
+summary_cache = ResultCache()
+
+
+def validate_input(text: str) -> Optional[str]:
+    """Returns a user-facing message if the text can't be summarized, otherwise None."""
     if summarizer is None:
         return "Error: Model not loaded correctly. Check logs."
 
@@ -50,18 +57,114 @@ def summarize_text(text: str, max_len: int, min_len: int) -> str:
     if len(text) < 50:
         return "⚠️ Input text is too short. Please provide a longer paragraph."
 
+    return None
+
+
+def batched_summarize(
+    texts: List[str], max_lens: List[int], min_lens: List[int], beams: List[int]
+) -> List[List[str]]:
+    """
+    Batched Gradio handler: summarizes every queued request in as few model calls as possible.
+
+    Cached summaries are returned directly; the remaining requests that share the same
+    generation settings are tokenized and decoded together in one pipeline call.
+    The result is returned in Gradio's one-list-per-output format.
+    """
+    results = [None] * len(texts)
+    groups: Dict[Tuple[int, int, int], List[int]] = {}
+
+    for i, (text, max_len, min_len, num_beams) in enumerate(zip(texts, max_lens, min_lens, beams)):
+        results[i] = validate_input(text)
+        if results[i] is not None:
+            continue
+
+        key = (text_key(text), int(max_len), int(min_len), int(num_beams))
+        results[i] = summary_cache.get(key)
+        if results[i] is None:
+            groups.setdefault(key[1:], []).append(i)
+
+    for (max_len, min_len, num_beams), indices in groups.items():
+        try:
+            logger.info(f"Processing batch of {len(indices)} summary request(s)...")
+            with summarizer_context(summarizer):
+                summary_list = summarizer(
+                    [texts[i] for i in indices],
+                    batch_size=BATCH_SIZE,
+                    truncation=True,
+                    max_length=max_len,
+                    min_length=min_len,
+                    num_beams=num_beams,
+                    do_sample=False,  # Deterministic output
+                    **GENERATION_KWARGS
+                )
+            for i, summary in zip(indices, summary_list):
+                results[i] = summary['summary_text']
+                summary_cache.put((text_key(texts[i]), max_len, min_len, num_beams), results[i])
+        except Exception as e:
+            logger.error(f"Summarization error: {e}")
+            for i in indices:
+                results[i] = f"An error occurred: {str(e)}"
+
+    return [results]
+
+
+def batched_beam_summarize(
+    texts: List[str], max_lens: List[int], min_lens: List[int], beams: List[int]
+) -> List[list]:
+    """
+    Batched Gradio handler for Summarize clicks that use beam search.
+
+    1-beam clicks are streamed by `summarize_text` instead; their output is left untouched here.
+    """
+    results = [gr.update()] * len(texts)
+    indices = [i for i, num_beams in enumerate(beams) if int(num_beams) > 1]
+    if indices:
+        summaries = batched_summarize(
+            [texts[i] for i in indices], [max_lens[i] for i in indices],
+            [min_lens[i] for i in indices], [beams[i] for i in indices]
+        )[0]
+        for i, summary in zip(indices, summaries):
+            results[i] = summary
+    return [results]
+
+
+def summarize_text(
+    text: str, max_len: int, min_len: int, num_beams: int = 1
+) -> Iterator[str]:
+    """
+    Generates a greedy (1-beam) summary for the provided text, yielding it as it grows.
+
+    Beam search can't be streamed, so beam clicks are served by `batched_beam_summarize`
+    and this handler leaves the output untouched for them.
+    """
+    if int(num_beams) > 1:
+        yield gr.update()
+        return
+
+    message = validate_input(text)
+    if message is not None:
+        yield message
+        return
+
+    key = (text_key(text), int(max_len), int(min_len), 1)
+    cached = summary_cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    logger.info("Processing streamed summary request...")
+    summary = ""
     try:
-        logger.info("Processing summary request...")
-        summary_list = summarizer(
-            text,
-            max_length=int(max_len),
-            min_length=int(min_len),
-            do_sample=False  # Deterministic output
-        )
-        return summary_list[0]['summary_text']
+        for chunk in stream_summary(summarizer, text, max_len, min_len):
+            summary += chunk
+            yield summary
     except Exception as e:
         logger.error(f"Summarization error: {e}")
-        return f"An error occurred: {str(e)}"
+        yield f"An error occurred: {str(e)}"
+        return
+
+    summary_cache.put(key, summary.strip())
+    yield summary.strip()
 
 
 def clear_fields():
@@ -107,6 +210,10 @@ def create_interface():
                         minimum=10, maximum=100, value=30, step=5, 
                         label="Min Length"
                     )
+                    beams_slider = gr.Slider(
+                        minimum=1, maximum=4, value=DEFAULT_NUM_BEAMS, step=1,
+                        label="Beams", info="1 beam streams the summary as it is generated"
+                    )
 
                 # Action Buttons
                 with gr.Row():
@@ -134,13 +241,44 @@ def create_interface():
         
         # Footer
         gr.Markdown("---")
-        gr.Markdown(f"**Model:** `{MODEL_NAME}` | **Device:** CPU Mode")
+        gr.Markdown(f"**Model:** `{MODEL_NAME}` | **Device:** {device_label()}")
 
         # Event Wiring
+        # Every summarizer event shares one concurrency slot: they use the same model and
+        # cache, so a streamed request and a batch never run at the same time.
+        # Gradio can't batch generator functions, so Summarize has two listeners: beam
+        # clicks (the default) are batched together, 1-beam clicks are streamed.
+        submit_btn.click(
+            fn=batched_beam_summarize,
+            inputs=[input_box, max_len_slider, min_len_slider, beams_slider],
+            outputs=[output_box],
+            batch=True,
+            max_batch_size=BATCH_SIZE,
+            api_name=None,
+            concurrency_limit=1,
+            concurrency_id="summarizer"
+        )
         submit_btn.click(
             fn=summarize_text,
-            inputs=[input_box, max_len_slider, min_len_slider],
-            outputs=[output_box]
+            inputs=[input_box, max_len_slider, min_len_slider, beams_slider],
+            outputs=[output_box],
+            api_name=None,
+            queue=True,
+            concurrency_limit=1,
+            concurrency_id="summarizer"
+        )
+
+        # Batched endpoint for API clients, registered on a hidden button
+        batch_btn = gr.Button(visible=False)
+        batch_btn.click(
+            fn=batched_summarize,
+            inputs=[input_box, max_len_slider, min_len_slider, beams_slider],
+            outputs=[output_box],
+            batch=True,
+            max_batch_size=BATCH_SIZE,
+            api_name="summarize_batch",
+            concurrency_limit=1,
+            concurrency_id="summarizer"
         )
 
         clear_btn.click(
@@ -161,4 +299,6 @@ def create_interface():
 
 if __name__ == "__main__":
     app = create_interface()
+    # One model call at a time; batched requests accumulate while the model is busy
+    app.queue(default_concurrency_limit=1, max_size=32)
     app.launch()
\ No newline at end of file
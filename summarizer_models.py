@@ -0,0 +1,494 @@
+"""
+Shared model loading for the Gradio apps.
+
+Import this module before torch/transformers: it pins the CPU thread pools first.
+
+Both the plain summarizer (`app.py`) and the NER tool (`text-summarizer-ner/app.py`)
+import their pipelines from here, so a process that serves both holds a single
+DistilBART instance. Loaders are wrapped in `functools.lru_cache` and only run on
+first use; a failed load raises and is retried on the next call.
+"""
+
+import os
+import shutil
+import logging
+import hashlib
+import threading
+import functools
+import contextlib
+import psutil
+from collections import OrderedDict
+
+# --- Threading ---
+# One intra-op thread per physical core: SMT siblings share the same GEMM units, so
+# using every logical core only oversubscribes them. OpenMP/MKL read these variables
+# when torch is first imported, so they are set before the torch import below.
+PHYSICAL_CORES = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+os.environ.setdefault("OMP_NUM_THREADS", str(PHYSICAL_CORES))
+os.environ.setdefault("MKL_NUM_THREADS", str(PHYSICAL_CORES))
+
+
+def env_num_threads(name: str = "OMP_NUM_THREADS") -> int:
+    """
+    Thread count from an environment variable, falling back to PHYSICAL_CORES.
+
+    OpenMP also accepts nested lists such as "8,1"; the outermost level is used.
+    Empty or malformed values fall back instead of failing at import time.
+    """
+    try:
+        threads = int(os.environ.get(name, "").split(",")[0])
+    except ValueError:
+        return PHYSICAL_CORES
+    return threads if threads > 0 else PHYSICAL_CORES
+
+
+import torch  # noqa: E402
+from packaging import version  # noqa: E402
+from pathlib import Path  # noqa: E402
+from typing import Any, Hashable, Iterator, List, Optional  # noqa: E402
+from transformers import (  # noqa: E402
+    AutoModelForSeq2SeqLM, AutoModelForTokenClassification, AutoTokenizer, PreTrainedModel,
+    StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer, pipeline
+)
+
+logger = logging.getLogger(__name__)
+
+torch.set_num_threads(env_num_threads())
+try:
+    torch.set_num_interop_threads(1)
+except RuntimeError:
+    # Already fixed once inter-op work has started (e.g. torch was imported and used earlier)
+    pass
+torch.backends.mkldnn.enabled = True
+
+# Let SDPA dispatch to the flash / memory-efficient attention kernels on GPU
+torch.backends.cuda.enable_flash_sdp(True)
+torch.backends.cuda.enable_mem_efficient_sdp(True)
+
+# Disable Hugging Face symlink warnings for Windows users
+os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
+
+# --- Constants ---
+SUMMARIZER_MODEL = "sshleifer/distilbart-cnn-12-6"
+NER_MODEL = "dslim/bert-base-NER"
+
+# Exported graphs live next to this file so both apps reuse the same one-time export
+MODELS_DIR = Path(__file__).resolve().parent
+SUMMARIZER_ONNX_DIR = MODELS_DIR / "distilbart_onnx"
+# Quantized graphs loaded by ORTModelForSeq2SeqLM; the export is complete only when all exist
+SUMMARIZER_ONNX_FILES = {
+    "encoder_file_name": "encoder_model_quantized.onnx",
+    "decoder_file_name": "decoder_model_quantized.onnx",
+    "decoder_with_past_file_name": "decoder_with_past_model_quantized.onnx",
+}
+NER_OV_DIR = MODELS_DIR / "bert_ner_ov_int8"
+
+# DistilBART's max position embeddings; longer inputs are truncated to this many tokens
+MAX_INPUT_TOKENS = 1024
+# CPU threads used by the OpenVINO NER runtime
+NER_NUM_THREADS = env_num_threads()
+
+# Decoding settings shared by every summary request (beam count is user-adjustable).
+# 2 beams halves decoder work vs. the checkpoint's default 4 at a negligible ROUGE cost.
+DEFAULT_NUM_BEAMS = 2
+GENERATION_KWARGS = {
+    "early_stopping": True,
+    "use_cache": True,
+    "no_repeat_ngram_size": 3,
+    "length_penalty": 1.0,
+}
+# Greedy (1-beam) decoding, used for streaming: beam-only flags would only trigger warnings
+BEAM_ONLY_KWARGS = ("early_stopping", "length_penalty")
+GREEDY_GENERATION_KWARGS = {k: v for k, v in GENERATION_KWARGS.items() if k not in BEAM_ONLY_KWARGS}
+
+# Number of recent results kept per cache (repeat demo/example submissions skip the model)
+RESULT_CACHE_SIZE = 256
+
+# Short inputs run once at load so kernels, allocators (and torch.compile) are hot before serving
+NER_WARMUP_TEXT = "Neil Armstrong walked on the Moon."
+WARMUP_TEXT = (
+    "Apollo 11 was the American spaceflight that first landed humans on the Moon. "
+    "Commander Neil Armstrong and lunar module pilot Buzz Aldrin landed the Apollo Lunar Module Eagle on July 20, 1969."
+)
+
+
+# --- Helpers ---
+@functools.lru_cache(maxsize=1)
+def cpu_supports_bf16() -> bool:
+    """Returns True when oneDNN has native BF16 kernels on this CPU (AVX512-BF16 / AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def quantize_onnx_dir(onnx_dir: Path):
+    """Dynamically quantizes every exported ONNX graph in `onnx_dir` to INT8 (AVX512-VNNI)."""
+    from optimum.onnxruntime import ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=True)
+    onnx_files = [f for f in sorted(onnx_dir.glob("*.onnx")) if not f.name.endswith("_quantized.onnx")]
+    for onnx_file in onnx_files:
+        quantizer = ORTQuantizer.from_pretrained(onnx_dir, file_name=onnx_file.name)
+        quantizer.quantize(save_dir=onnx_dir, quantization_config=qconfig)
+
+
+def cuda_dtype() -> torch.dtype:
+    """
+    Half-precision dtype for GPU weights: BF16 on Ampere+ (compute capability 8.0+), else FP16.
+
+    Capability is checked directly because `torch.cuda.is_bf16_supported()` also reports
+    emulated BF16 on older cards (T4, V100), which is much slower than their native FP16.
+    """
+    return torch.bfloat16 if torch.cuda.get_device_capability()[0] >= 8 else torch.float16
+
+
+def device_label() -> str:
+    """
+    Human-readable description of where the models run, for the UI footer.
+
+    Derived from the same checks the loaders use, so building the UI never loads a model.
+    """
+    if torch.cuda.is_available():
+        dtype = str(cuda_dtype()).replace("torch.", "").upper()
+        return f"GPU ({torch.cuda.get_device_name(0)}, {dtype})"
+    return "CPU Mode"
+
+
+def enable_fast_attention(model: PreTrainedModel) -> PreTrainedModel:
+    """
+    Switches a PyTorch model to fused scaled-dot-product attention.
+
+    Recent transformers releases already load supported models with native SDPA; on older
+    versions the model is converted with optimum's BetterTransformer instead. Models that
+    neither path supports are returned unchanged.
+    """
+    if getattr(model.config, "_attn_implementation", None) == "sdpa":
+        return model
+
+    try:
+        from optimum.bettertransformer import BetterTransformer
+        return BetterTransformer.transform(model, keep_original_model=False)
+    except Exception as e:
+        logger.warning(f"SDPA fast path unavailable for {model.config.name_or_path}: {e}")
+        return model
+
+
+# --- Result Caching ---
+def text_key(text: str) -> str:
+    """Fixed-size cache key for arbitrarily long input text."""
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+class ResultCache:
+    """
+    Bounded LRU cache for inference results.
+
+    Thread-safe: Gradio runs handlers on worker threads, so every access holds a lock.
+    """
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Returns the cached value (marking it recently used), or None on a miss."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key: Hashable, value: Any):
+        """Stores a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# --- Summarizer ---
+def load_summarizer():
+    """
+    Builds the summarization pipeline on top of an INT8 ONNX Runtime model.
+
+    The DistilBART checkpoint is exported to ONNX and dynamically quantized
+    (AVX512-VNNI, per-channel) once, then reused from `SUMMARIZER_ONNX_DIR`.
+    On CUDA machines the PyTorch model is loaded directly in half precision
+    (spread across GPUs by `device_map="auto"`) instead, and it is also the
+    fallback when `optimum` is not installed.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(SUMMARIZER_MODEL, use_fast=True)
+    tokenizer.model_max_length = MAX_INPUT_TOKENS
+
+    if torch.cuda.is_available():
+        # The INT8 ONNX graph targets CPU kernels; on GPU use half-precision PyTorch weights instead
+        logger.info(f"CUDA detected; loading {cuda_dtype()} PyTorch summarizer.")
+        model = AutoModelForSeq2SeqLM.from_pretrained(
+            SUMMARIZER_MODEL, torch_dtype=cuda_dtype(), device_map="auto", low_cpu_mem_usage=True
+        )
+        return pipeline("summarization", model=enable_fast_attention(model), tokenizer=tokenizer)
+
+    try:
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    except ImportError:
+        logger.warning("optimum[onnxruntime] not installed; using the FP32 PyTorch summarizer.")
+        model = AutoModelForSeq2SeqLM.from_pretrained(SUMMARIZER_MODEL, low_cpu_mem_usage=True)
+        return pipeline("summarization", model=enable_fast_attention(model), tokenizer=tokenizer)
+
+    onnx_dir = SUMMARIZER_ONNX_DIR
+    if not all((onnx_dir / name).exists() for name in SUMMARIZER_ONNX_FILES.values()):
+        logger.info(f"Exporting {SUMMARIZER_MODEL} to ONNX (one-time step)...")
+        # Build in a scratch directory and move it into place when done, so an interrupted
+        # export never leaves a half-quantized SUMMARIZER_ONNX_DIR behind
+        build_dir = onnx_dir.with_name(onnx_dir.name + ".tmp")
+        shutil.rmtree(build_dir, ignore_errors=True)
+        ORTModelForSeq2SeqLM.from_pretrained(SUMMARIZER_MODEL, export=True, use_cache=True).save_pretrained(build_dir)
+        tokenizer.save_pretrained(build_dir)
+        # Encoder, decoder and decoder-with-past are separate graphs; each one is quantized
+        quantize_onnx_dir(build_dir)
+        shutil.rmtree(onnx_dir, ignore_errors=True)
+        build_dir.rename(onnx_dir)
+
+    model = ORTModelForSeq2SeqLM.from_pretrained(onnx_dir, use_io_binding=True, **SUMMARIZER_ONNX_FILES)
+    return pipeline("summarization", model=model, tokenizer=tokenizer)
+
+
+def warmup_summarizer(summarizer):
+    """
+    Runs short beam-search and greedy generations so the first user request doesn't pay
+    the cold-start cost.
+
+    This takes care of ONNX Runtime session setup, oneDNN/cuDNN kernel selection and
+    allocator growth, plus graph capture for both decoding paths when the model is compiled.
+    """
+    with summarizer_context(summarizer):
+        summarizer(
+            WARMUP_TEXT, max_length=60, min_length=20, num_beams=DEFAULT_NUM_BEAMS,
+            do_sample=False, **GENERATION_KWARGS
+        )
+        summarizer(
+            WARMUP_TEXT, max_length=60, min_length=20, num_beams=1,
+            do_sample=False, **GREEDY_GENERATION_KWARGS
+        )
+
+
+def compile_summarizer(summarizer) -> bool:
+    """
+    Compiles the PyTorch model's forward pass with Inductor and warms it up.
+
+    Compilation happens on the first call, so the warmup keeps that cost away from the
+    first user request. The default Inductor mode is used: CUDA-graph capture
+    ("reduce-overhead") re-records for every new shape and beam count. ONNX Runtime
+    models and torch < 2.1 are left untouched. If compilation fails, during warmup or on
+    a later call (new sequence length, beam count or worker thread), the eager forward
+    is restored permanently. Returns True if the model was compiled (and therefore
+    already warmed up).
+    """
+    model = summarizer.model
+    if not isinstance(model, PreTrainedModel) or version.parse(torch.__version__) < version.parse("2.1"):
+        return False
+
+    eager_forward = model.forward
+    compiled_forward = torch.compile(eager_forward, dynamic=True)
+
+    # generate() inspects the forward signature (e.g. to build attention_mask), so keep it visible
+    @functools.wraps(eager_forward)
+    def forward(*args, **kwargs):
+        if model.forward is not forward:
+            # Another thread already fell back to eager mode
+            return eager_forward(*args, **kwargs)
+        try:
+            return compiled_forward(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"torch.compile failed at runtime, switching to eager mode: {e}")
+            model.forward = eager_forward
+            return eager_forward(*args, **kwargs)
+
+    model.forward = forward
+    try:
+        logger.info("Compiling summarizer with torch.compile (warmup run)...")
+        warmup_summarizer(summarizer)
+        return True
+    except Exception as e:
+        logger.warning(f"torch.compile failed, falling back to eager mode: {e}")
+        model.forward = eager_forward
+        return False
+
+
+@functools.lru_cache(maxsize=1)
+def get_summarizer():
+    """Returns the process-wide summarization pipeline, loading and warming it up on first use."""
+    summarizer = load_summarizer()
+    if not compile_summarizer(summarizer):
+        try:
+            logger.info("Warming up summarizer...")
+            warmup_summarizer(summarizer)
+        except Exception as e:
+            logger.warning(f"Summarizer warmup failed: {e}")
+    return summarizer
+
+
+def use_cpu_autocast(summarizer) -> bool:
+    """BF16 autocast only helps the FP32 PyTorch summarizer on CPUs with native BF16 support."""
+    return (
+        isinstance(summarizer.model, PreTrainedModel)
+        and summarizer.device.type == "cpu"
+        and cpu_supports_bf16()
+    )
+
+
+@contextlib.contextmanager
+def summarizer_context(summarizer):
+    """Wraps summarizer calls in inference mode, with CPU BF16 autocast where it pays off."""
+    with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=use_cpu_autocast(summarizer)):
+        yield
+
+
+class StopOnEvent(StoppingCriteria):
+    """Stops generation once `event` is set (e.g. the consumer of a stream went away)."""
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def stream_summary(summarizer, text: str, max_len: int, min_len: int) -> Iterator[str]:
+    """
+    Greedy-decodes a summary on a worker thread, yielding text chunks as they are generated.
+
+    transformers can't stream beam search, so this always decodes with a single beam.
+    If the generator is closed early (client disconnect, Gradio cancellation), the worker
+    is told to stop and joined, so it never keeps decoding in the background.
+    A generation error ends the stream and is re-raised to the caller.
+    """
+    tokenizer, model = summarizer.tokenizer, summarizer.model
+    inputs = tokenizer(text, return_tensors="pt", truncation=True).to(model.device)
+    streamer = TextIteratorStreamer(tokenizer, skip_special_tokens=True)
+    stop = threading.Event()
+    errors = []
+
+    def generate():
+        # inference_mode/autocast are thread-local, so they are entered inside the worker thread
+        try:
+            with summarizer_context(summarizer):
+                model.generate(
+                    **inputs,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([StopOnEvent(stop)]),
+                    max_length=int(max_len),
+                    min_length=int(min_len),
+                    num_beams=1,
+                    do_sample=False,  # Deterministic output
+                    **GREEDY_GENERATION_KWARGS
+                )
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=generate, daemon=True)
+    thread.start()
+    try:
+        yield from streamer
+    finally:
+        stop.set()
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+# --- NER ---
+class TokenClassifier:
+    """
+    Lightweight replacement for `pipeline("ner", aggregation_strategy="simple")`.
+
+    Runs the tokenizer and model directly, takes the argmax label per token and merges
+    BIO tags into entity spans in a single pass, instead of the pipeline's per-token
+    dict construction and aggregation. Returns the same `start`/`end`/`entity_group`/`word`
+    keys; the pipeline's `score` is not computed.
+    """
+    def __init__(self, model, tokenizer):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.id2label = model.config.id2label
+
+    # inference_mode is thread-local, and NER is also called from worker threads
+    @torch.inference_mode()
+    def __call__(self, text: str) -> List[dict]:
+        enc = self.tokenizer(text, return_tensors="pt", return_offsets_mapping=True, truncation=True)
+        offsets = enc.pop("offset_mapping")[0].tolist()
+        logits = self.model(**enc.to(self.model.device)).logits[0]
+        labels = logits.argmax(-1).tolist()
+
+        entities = []
+        current = None
+        for label_id, (start, end) in zip(labels, offsets):
+            if start == end:  # [CLS]/[SEP]
+                continue
+            tag, _, group = self.id2label[label_id].partition("-")
+            # I- continues the open entity of the same type; B- always starts a new one
+            if current and tag == "I" and group == current["entity_group"]:
+                current["end"] = end
+                continue
+            current = {"entity_group": group, "start": start, "end": end} if group else None
+            if current:
+                entities.append(current)
+
+        for entity in entities:
+            entity["word"] = text[entity["start"]:entity["end"]]
+        return entities
+
+
+def load_ner():
+    """
+    Builds the NER model on OpenVINO with INT8-compressed weights, exporting it if needed.
+
+    On CUDA machines the PyTorch model runs on the GPU in half precision instead.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(NER_MODEL, use_fast=True)
+
+    if torch.cuda.is_available():
+        logger.info(f"CUDA detected; loading {cuda_dtype()} PyTorch NER model.")
+        model = AutoModelForTokenClassification.from_pretrained(
+            NER_MODEL, torch_dtype=cuda_dtype(), device_map="auto", low_cpu_mem_usage=True
+        )
+        return TokenClassifier(enable_fast_attention(model), tokenizer)
+
+    try:
+        from optimum.intel import OVModelForTokenClassification
+    except ImportError:
+        logger.warning("optimum[openvino] not installed; using the FP32 PyTorch NER model.")
+        model = AutoModelForTokenClassification.from_pretrained(NER_MODEL, low_cpu_mem_usage=True)
+        return TokenClassifier(enable_fast_attention(model), tokenizer)
+
+    ov_config = {"INFERENCE_NUM_THREADS": str(NER_NUM_THREADS)}
+
+    if not (NER_OV_DIR / "openvino_model.xml").exists():
+        logger.info("Exporting NER model to OpenVINO INT8 (one-time step)...")
+        OVModelForTokenClassification.from_pretrained(
+            NER_MODEL, export=True, load_in_8bit=True, compile=False
+        ).save_pretrained(NER_OV_DIR)
+        tokenizer.save_pretrained(NER_OV_DIR)
+
+    model = OVModelForTokenClassification.from_pretrained(NER_OV_DIR, ov_config=ov_config, compile=True)
+    return TokenClassifier(model, tokenizer)
+
+
+@functools.lru_cache(maxsize=1)
+def get_ner():
+    """Returns the process-wide NER model (a `TokenClassifier`), loading and warming it up on first use."""
+    ner = load_ner()
+    try:
+        ner(NER_WARMUP_TEXT)
+    except Exception as e:
+        logger.warning(f"NER warmup failed: {e}")
+    return ner
+
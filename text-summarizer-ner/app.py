@@ -6,21 +6,30 @@ A Gradio-based web interface that uses Hugging Face Transformers to:
 2. Perform Named Entity Recognition (NER) on the summary using BERT.
 """
 
-import os
+import re
+import sys
 import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import gradio as gr
+from pathlib import Path
 from typing import List, Tuple, Optional
 from dataclasses import dataclass
 
-# Third-party imports
-from transformers import pipeline
+# Model loading is shared with the top-level summarizer app (../summarizer_models.py)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from summarizer_models import (  # noqa: E402
+    DEFAULT_NUM_BEAMS, GENERATION_KWARGS, NER_MODEL, SUMMARIZER_MODEL, ResultCache,
+    device_label, get_ner, get_summarizer, stream_summary, summarizer_context, text_key
+)
 
 # --- Configuration ---
 @dataclass
 class AppConfig:
     """Global configuration constants."""
-    SUM_MODEL: str = "sshleifer/distilbart-cnn-12-6"
-    NER_MODEL: str = "dslim/bert-base-NER"
+    SUM_MODEL: str = SUMMARIZER_MODEL
+    NER_MODEL: str = NER_MODEL
+    NUM_BEAMS: int = DEFAULT_NUM_BEAMS
     TITLE: str = "Text Summarizer & Named Entity Recognition"
     DESC: str = """
     ### Text Analysis
@@ -37,6 +46,12 @@ class AppConfig:
         "Michael Collins flew the Command Module Columbia alone in lunar orbit while they were on the Moon's surface."
     )
 
+# Closing punctuation followed by whitespace and a capital marks a finished sentence.
+# Periods after a single capital ("U.S.") or a common title ("Dr.") are not sentence ends.
+SENTENCE_END = re.compile(r"(?<!\b[A-Z])(?<!\bMr)(?<!\bMs)(?<!\bDr)(?<!\bSt)(?<!\bMrs)[.!?](?=\s+[A-Z\"'])")
+# Entities are proper nouns; text without a capitalized word can skip the NER model
+CAPITALIZED_WORD = re.compile(r"\b[A-Z][a-zA-Z]{1,}")
+
 # --- Logging Setup ---
 logging.basicConfig(
     level=logging.INFO,
@@ -44,9 +59,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Suppress Hugging Face symlink warnings on Windows
-os.environ["HF_HUB_DISABLE_SYMLINKS_WARNING"] = "1"
-
 
 class TextProcessor:
     """
@@ -54,67 +66,138 @@ class TextProcessor:
     """
     def __init__(self):
         self.summarizer = None
-        self.ner_pipeline = None
+        self.ner_model = None
+        # (summary_text, formatted_ner_list) keyed on (text hash, max_len, min_len, num_beams)
+        self.cache = ResultCache()
         self._load_models()
 
     def _load_models(self):
-        """Initializes HF pipelines with error handling."""
+        """Fetches the shared summarizer and NER models with error handling."""
         try:
             logger.info(f"Loading Summarizer: {AppConfig.SUM_MODEL}...")
-            self.summarizer = pipeline("summarization", model=AppConfig.SUM_MODEL)
+            self.summarizer = get_summarizer()
 
             logger.info(f"Loading NER: {AppConfig.NER_MODEL}...")
-            # aggregation_strategy='simple' merges sub-tokens (e.g., "New", "York" -> "New York")
-            self.ner_pipeline = pipeline("ner", model=AppConfig.NER_MODEL, aggregation_strategy="simple")
+            self.ner_model = get_ner()
             
             logger.info("✅ Models loaded successfully.")
         except Exception as e:
             logger.error(f"❌ Model loading failed: {e}")
 
-    def process(self, text: str, max_len: int, min_len: int) -> Tuple[str, List]:
+    def _run_ner(self, text: str) -> List[dict]:
+        """Runs NER, skipping the BERT forward pass when no word is capitalized."""
+        if not CAPITALIZED_WORD.search(text):
+            return []
+        return self.ner_model(text)
+
+    def _ner_sentences(self, summary: str, start: int = 0, final: bool = True) -> Tuple[int, List[Tuple[int, str]]]:
+        """
+        Splits summary[start:] into sentences for NER on a streamed summary.
+
+        Without `final`, the unfinished trailing text is held back.
+
+        Returns:
+            Tuple(next_start, [(sentence_offset, sentence), ...])
+        """
+        sentences = []
+        for match in SENTENCE_END.finditer(summary, start):
+            sentences.append((start, summary[start:match.end()]))
+            start = match.end()
+        if final and summary[start:].strip():
+            sentences.append((start, summary[start:]))
+            start = len(summary)
+        return start, sentences
+
+    def _summarize_with_overlapped_ner(self, text: str, max_len: int, min_len: int) -> Tuple[str, List]:
+        """
+        Streams a greedy summary and runs NER on each finished sentence while decoding continues.
+
+        Returns:
+            Tuple(summary_text, ner_entities) with entity offsets relative to summary_text
+        """
+        summary = ""
+        sentence_start = 0
+        pending = []  # (sentence offset, NER future)
+
+        with ThreadPoolExecutor(max_workers=1) as ner_pool:
+            for chunk in stream_summary(self.summarizer, text, max_len, min_len):
+                summary += chunk
+                sentence_start, sentences = self._ner_sentences(summary, sentence_start, final=False)
+                pending += [(offset, ner_pool.submit(self._run_ner, s)) for offset, s in sentences]
+
+            _, sentences = self._ner_sentences(summary, sentence_start)
+            pending += [(offset, ner_pool.submit(self._run_ner, s)) for offset, s in sentences]
+
+            # The streamed text starts with the decoder's leading space; shift offsets past it
+            lead = len(summary) - len(summary.lstrip())
+            ner_res = [
+                {**entity, "start": entity["start"] + offset - lead, "end": entity["end"] + offset - lead}
+                for offset, future in pending
+                for entity in future.result()
+            ]
+
+        return summary.strip(), ner_res
+
+    def process(self, text: str, max_len: int, min_len: int, num_beams: int = AppConfig.NUM_BEAMS) -> Tuple[str, List]:
         """
         Runs the summarization and NER inference pipeline.
         
         Returns:
             Tuple(summary_text, formatted_ner_list)
         """
-        if not self.summarizer or not self.ner_pipeline:
+        if not self.summarizer or not self.ner_model:
             return "⚠️ Error: Models not initialized. See logs.", []
 
         if not text or len(text.strip()) < 50:
             return "⚠️ Text too short. Please provide at least 50 characters.", []
 
+        key = (text_key(text), int(max_len), int(min_len), int(num_beams))
+        cached = self.cache.get(key)
+        if cached is not None:
+            summary_text, formatted_output = cached
+            return summary_text, list(formatted_output)
+
         try:
-            # 1. Summarize
-            summary_res = self.summarizer(
-                text, 
-                max_length=int(max_len), 
-                min_length=int(min_len), 
-                do_sample=False
-            )
-            summary_text = summary_res[0]['summary_text']
-
-            # 2. NER Analysis
-            ner_res = self.ner_pipeline(summary_text)
+            if int(num_beams) == 1:
+                # 1 + 2. Greedy decoding streams, so NER runs on each sentence as it completes
+                summary_text, ner_res = self._summarize_with_overlapped_ner(text, max_len, min_len)
+            else:
+                # 1. Summarize
+                with summarizer_context(self.summarizer):
+                    summary_res = self.summarizer(
+                        text, 
+                        max_length=int(max_len), 
+                        min_length=int(min_len), 
+                        num_beams=int(num_beams),
+                        truncation=True,
+                        do_sample=False,
+                        **GENERATION_KWARGS
+                    )
+                summary_text = summary_res[0]['summary_text']
+
+                # 2. NER Analysis
+                ner_res = self._run_ner(summary_text)
 
             # 3. Format for Gradio HighlightedText
-            # We must stitch the text back together to show non-entities + entities
-            formatted_output = []
-            cursor = 0
-            
-            for entity in ner_res:
-                # Text before entity
-                if entity['start'] > cursor:
-                    formatted_output.append((summary_text[cursor:entity['start']], None))
-                
-                # The Entity
-                formatted_output.append((summary_text[entity['start']:entity['end']], entity['entity_group']))
-                cursor = entity['end']
-            
+            # Interleave the plain-text gaps with the entity spans; empty gaps are dropped
+            starts = [e['start'] for e in ner_res]
+            ends = [e['end'] for e in ner_res]
+            groups = [e['entity_group'] for e in ner_res]
+            cursors = [0, *ends[:-1]]
+
+            formatted_output = [
+                segment
+                for c, s, e, g in zip(cursors, starts, ends, groups)
+                for segment in ((summary_text[c:s], None), (summary_text[s:e], g))
+                if segment[0]
+            ]
+
             # Remaining text
-            if cursor < len(summary_text):
-                formatted_output.append((summary_text[cursor:], None))
+            tail = summary_text[ends[-1] if ends else 0:]
+            if tail:
+                formatted_output.append((tail, None))
 
+            self.cache.put(key, (summary_text, tuple(formatted_output)))
             return summary_text, formatted_output
 
         except Exception as e:
@@ -122,6 +205,12 @@ class TextProcessor:
             return f"Error during processing: {e}", []
 
 
+@functools.lru_cache(maxsize=1)
+def get_processor() -> TextProcessor:
+    """Returns the process-wide TextProcessor, loading the models on first use."""
+    return TextProcessor()
+
+
 # --- JavaScript Helpers ---
 # Used for the manual copy button
 JS_COPY = """
@@ -133,7 +222,9 @@ JS_COPY = """
 
 # --- Main UI Construction ---
 def build_interface():
-    processor = TextProcessor()
+    def run_analysis(text: str, max_len: int, min_len: int, num_beams: int) -> Tuple[str, List]:
+        return get_processor().process(text, max_len, min_len, num_beams)
+
     with gr.Blocks(title=AppConfig.TITLE) as app:
         
         # Header
@@ -153,6 +244,7 @@ def build_interface():
                 with gr.Accordion("⚙️ Settings", open=False):
                     slider_max = gr.Slider(50, 300, value=130, step=10, label="Max Length")
                     slider_min = gr.Slider(10, 100, value=30, step=5, label="Min Length")
+                    slider_beams = gr.Slider(1, 4, value=AppConfig.NUM_BEAMS, step=1, label="Beams")
 
                 with gr.Row():
                     btn_clear = gr.Button("🗑️ Clear", variant="secondary")
@@ -177,12 +269,15 @@ def build_interface():
         gr.Examples([AppConfig.SAMPLE_TEXT], inputs=[input_box], label="Try an Example")
         
         gr.Markdown("---")
-        gr.Markdown(f"**Engine:** `{AppConfig.SUM_MODEL}` + `{AppConfig.NER_MODEL}`")
+        gr.Markdown(
+            f"**Engine:** `{AppConfig.SUM_MODEL}` + `{AppConfig.NER_MODEL}` | "
+            f"**Device:** {device_label()}"
+        )
 
         # --- Interactions ---
         btn_submit.click(
-            processor.process, 
-            inputs=[input_box, slider_max, slider_min], 
+            run_analysis, 
+            inputs=[input_box, slider_max, slider_min, slider_beams], 
             outputs=[out_summary, out_ner]
         )
 
@@ -197,5 +292,7 @@ def build_interface():
     return app
 
 if __name__ == "__main__":
+    # Load the models once, up front, so every request (and forked worker) shares them
+    get_processor()
     demo = build_interface()
     demo.launch()
\ No newline at end of file